@@ -1,25 +1,88 @@
 import os
-import requests
+import asyncio
+import gzip
+import functools
+import hashlib
+import time
+import httpx
 import json
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+import orjson # Fast JSON parsing/serialization straight from/to bytes
+from cachetools import TLRUCache
+from quart import Quart, request, Response
 import logging # For better logging
 
-# --- Flask App Setup ---
-app = Flask(__name__)
+try:
+    import brotli # In requirements.txt; used for our responses and lets httpx decode br from Medium
+except ImportError:
+    brotli = None # Fall back to gzip/deflate in both directions
+
+# --- Quart App Setup ---
+# Quart is the asyncio re-implementation of the Flask API, so the routes below read the same,
+# but a request waiting on Medium no longer ties up a whole worker thread.
+app = Quart(__name__)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO) # You can change this to logging.DEBUG for more verbose output
 # If running in iSH/locally and not seeing logs from app.logger,
-# this ensures Flask's default logger also outputs.
+# this ensures Quart's default logger also outputs.
 app.logger.setLevel(logging.INFO)
 
 
 # CORS Configuration:
-# For development in iSH and initial Render deployment, allow all origins.
+# ALLOWED_ORIGINS is a comma-separated list of origins; "*" (the default) allows all origins,
+# which is fine for development in iSH and initial Render deployment.
 # For a production frontend, you should restrict this to your actual frontend domain:
-# Example: CORS(app, resources={r"/get-tag-feed": {"origins": "https://your-actual-frontend-domain.com"}})
-CORS(app)
+# Example: ALLOWED_ORIGINS=https://your-actual-frontend-domain.com
+ALLOWED_ORIGINS = frozenset(origin.strip() for origin in os.environ.get("ALLOWED_ORIGINS", "*").split(",") if origin.strip())
+ALLOW_ANY_ORIGIN = "*" in ALLOWED_ORIGINS
+CORS_PREFLIGHT_HEADERS = {
+    "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type, If-None-Match", # When the preflight doesn't list any
+    "Access-Control-Max-Age": "86400", # Let browsers reuse a preflight for a day
+}
+
+@app.after_request
+async def add_cors_headers(response):
+    """Adds CORS headers for allowed origins; a set lookup instead of a CORS extension's pattern matching."""
+    origin = request.headers.get("Origin")
+    if not ALLOW_ANY_ORIGIN:
+        response.vary.add("Origin")
+    if origin is None or not (ALLOW_ANY_ORIGIN or origin in ALLOWED_ORIGINS):
+        return response
+
+    response.headers["Access-Control-Allow-Origin"] = "*" if ALLOW_ANY_ORIGIN else origin
+    response.headers["Access-Control-Expose-Headers"] = "ETag"
+    if request.method == "OPTIONS":
+        response.headers.update(CORS_PREFLIGHT_HEADERS)
+        # Like flask-cors/quart-cors, allow whatever headers the browser asks for in its preflight
+        requested_headers = request.headers.get("Access-Control-Request-Headers")
+        if requested_headers:
+            response.headers["Access-Control-Allow-Headers"] = requested_headers
+            response.vary.add("Access-Control-Request-Headers")
+    return response
+
+# Response compression:
+# Article lists are repetitive JSON (URLs, keys, author names) and shrink several times over when
+# compressed. Bodies smaller than COMPRESS_MIN_SIZE aren't worth the CPU.
+COMPRESS_MIN_SIZE = 500
+
+@app.after_request
+async def compress_response(response):
+    """Brotli- or gzip-compresses JSON responses when the client accepts it."""
+    if response.mimetype != "application/json" or "Content-Encoding" in response.headers:
+        return response
+    response.vary.add("Accept-Encoding")
+    body = await response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+
+    if brotli is not None and request.accept_encodings.quality("br") > 0:
+        response.set_data(brotli.compress(body, quality=5))
+        response.headers["Content-Encoding"] = "br"
+    elif request.accept_encodings.quality("gzip") > 0:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers["Content-Encoding"] = "gzip"
+    return response
 
 # --- Configuration ---
 MEDIUM_GRAPHQL_ENDPOINT = "https://medium.com/_/graphql"
@@ -31,196 +94,410 @@ MEDIUM_API_KEY = os.environ.get("MEDIUM_API_KEY")
 BASE_REQUEST_HEADERS = {
     "Content-Type": "application/json",
     "Accept": "application/json", # Explicitly request JSON
+    # Compressed transport; httpx decompresses transparently (br only when brotli is importable)
+    "Accept-Encoding": "gzip, deflate, br" if brotli is not None else "gzip, deflate",
     "Origin": "https://medium.com",
     "Referer": "https://medium.com/",
     "User-Agent": "PythonBackend/1.0 (MediumFeedFetcher; +https://yourdomain.com/info)" # Be a good internet citizen
 }
 
-# --- Helper Functions ---
-def clean_medium_response(text):
-    """Cleans the typical Medium GraphQL response prefix like '])}while(1);</x>'."""
-    prefix_to_remove = "])}while(1);</x>"
-    if text.startswith(prefix_to_remove):
-        return text[len(prefix_to_remove):]
-    return text
+# TagFeed modes accepted by Medium's GraphQL API.
+VALID_MODES = frozenset({"HOT", "NEW", "TOP_ALL_TIME", "TOP_MONTH", "TOP_WEEK", "TOP_YEAR"})
+VALID_MODES_MSG = "Invalid mode. Must be one of: " + ", ".join(sorted(VALID_MODES))
+
+# TagFeed query, limited to the fields the handler actually uses:
+#   post.id         -> fallback link when there is no mediumUrl/uniqueSlug
+#   post.uniqueSlug -> fallback link construction
+#   creator.username -> part of the fallback URL structure
+# Whitespace is collapsed once at import so the minimal query is what goes over the wire.
+GRAPHQL_QUERY = " ".join("""
+query TagFeed($tagSlug: String!, $mode: TagFeedMode!) {
+  tagFeed(tagSlug: $tagSlug, mode: $mode) {
+    items {
+      post {
+        id
+        title
+        mediumUrl
+        uniqueSlug
+        creator {
+          name
+          username
+        }
+      }
+    }
+  }
+}
+""".split())
 
-# --- Routes ---
-@app.route('/') # Root route to check if the app is alive
-def home():
-    app.logger.info("Home route accessed.")
-    return jsonify({"status": "Medium TagFeed Proxy is running correctly!", "message": "Welcome!"}), 200
+# Shared async HTTP client for all calls to Medium, created when the server starts (see below).
+# One client keeps connections alive between requests, and with HTTP/2 many concurrent
+# upstream calls share a single TCP connection. Failed connection attempts are retried.
+CLIENT = None
+# How long an idle pooled connection to Medium is kept. httpx's default (5s) drops it after short
+# idle gaps, and the next request then pays for DNS + TCP + TLS again.
+MEDIUM_KEEPALIVE_SECONDS = 120
 
-@app.route('/get-tag-feed', methods=['POST'])
-def get_tag_feed_handler():
-    app.logger.info(f"Received request for /get-tag-feed from IP: {request.remote_addr}")
+# Upper bound on feeds per /get-tag-feeds call, so one client can't fan out unbounded upstream calls.
+MAX_BATCH_FEEDS = 20
 
-    if not MEDIUM_API_KEY:
-        app.logger.error("CRITICAL: MEDIUM_API_KEY environment variable not configured on the server.")
-        return jsonify({"error": "Server configuration error: API key missing."}), 500
+# Processed articles per (tagSlug, mode), so repeat requests skip the Medium round-trip.
+# "HOT"/"NEW" feeds move quickly and are kept briefly; "TOP_*" feeds are kept longer.
+# No lock is needed: everything runs on the event loop's single thread, so get/set never interleave
+# mid-operation, and two concurrent misses for the same key at worst share one in-flight fetch.
+FEED_CACHE_TTL_SECONDS = {"HOT": 30, "NEW": 30}
+FEED_CACHE_TTL_TOP_SECONDS = 600
 
-    try:
-        client_data = request.get_json()
-        if not client_data:
-            app.logger.warning("Received empty/invalid JSON data in request body.")
-            return jsonify({"error": "No JSON data provided in request body or invalid JSON format."}), 400
-    except Exception as e:
-        app.logger.warning(f"Error decoding JSON from request: {e}")
-        return jsonify({"error": "Invalid JSON format in request body."}), 400
+def _feed_cache_expiry(key, value, now):
+    return now + FEED_CACHE_TTL_SECONDS.get(key[1], FEED_CACHE_TTL_TOP_SECONDS)
+
+FEED_CACHE = TLRUCache(maxsize=1024, ttu=_feed_cache_expiry)
+
+# Upstream fetches currently running, per (tagSlug, mode). When many clients miss the cache
+# for the same feed at once, the first one starts the fetch and the rest await the same task,
+# so Medium sees one request instead of N. Single-threaded like FEED_CACHE, so no lock either.
+INFLIGHT_FETCHES = {}
 
+# Shared read-only stand-in for missing nested objects (e.g. a post without "creator"),
+# so the per-item loop doesn't allocate a throwaway dict for every lookup.
+EMPTY = {}
+
+# --- Helper Functions ---
+MEDIUM_RESPONSE_PREFIX = b"])}while(1);</x>"
+
+def clean_medium_response(raw):
+    """Cleans the typical Medium GraphQL response prefix like '])}while(1);</x>'.
+    Works on the raw response bytes so the body never has to be decoded to a str."""
+    if raw.startswith(MEDIUM_RESPONSE_PREFIX):
+        return raw[len(MEDIUM_RESPONSE_PREFIX):]
+    return raw
+
+def article_link(post_data, creator):
+    """Returns the best available link for a post, or "" if none can be built."""
+    medium_url = post_data.get("mediumUrl") # Prefer this if available
+    if medium_url:
+        return medium_url
+
+    # Fallback link construction
+    unique_slug = post_data.get("uniqueSlug")
+    if unique_slug:
+        author_username = creator.get("username")
+        if author_username:
+            return f"https://{author_username}.medium.com/{unique_slug}"
+        # Fallback if author username isn't available for the URL pattern
+        # This pattern might need adjustment based on how Medium constructs URLs for posts without a custom subdomain
+        return f"https://medium.com/p/{post_data.get('id') or unique_slug}" # Use post.id if available, else uniqueSlug
+
+    post_id = post_data.get("id")
+    if post_id: # Absolute last resort, may not be a direct link
+        return f"https://medium.com/p/{post_id}" # This format can be unreliable; test it
+    return ""
+
+def make_article(post_data):
+    """Formats one post from the TagFeed response as {"title", "author", "link"}.
+    Returns None when no link can be built for the post."""
+    creator = post_data.get("creator") or EMPTY
+    link = article_link(post_data, creator)
+    if not link:
+        return None
+    return {
+        "title": post_data.get("title", "Untitled"),
+        "author": creator.get("name") or "Unknown Author",
+        "link": link
+    }
 
-    tag_slug = client_data.get('tagSlug')
-    mode = client_data.get('mode')
+def json_response(data, status=200):
+    """Serializes data with orjson into a JSON response (replacement for jsonify)."""
+    return Response(orjson.dumps(data), status=status, mimetype="application/json")
+
+def feed_response(articles):
+    """Builds the JSON response for a list of articles, tagged with a weak ETag of its body.
+    Returns an empty 304 when the client already holds that body (If-None-Match)."""
+    body = orjson.dumps({"articles": articles})
+    # BLAKE2b is faster than SHA-1/SHA-256 here; weak because compression may change the bytes on the wire
+    digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+    etag = f'W/"{digest}"'
+    # A 304 must repeat the caching headers of the 200 it stands for, or clients lose the refreshed max-age
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=30", "Vary": "Accept-Encoding"}
+    if request.if_none_match.contains_weak(digest):
+        return Response("", status=304, headers=headers)
+    return Response(body, status=200, mimetype="application/json", headers=headers)
+
+# --- Lifecycle ---
+@app.before_serving
+async def open_medium_client():
+    global CLIENT
+    limits = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=MEDIUM_KEEPALIVE_SECONDS)
+    request_headers_to_medium = dict(BASE_REQUEST_HEADERS)
+    if MEDIUM_API_KEY:
+        # Ensure this matches Medium's expected auth scheme for its GraphQL API key
+        # Common schemes: "Bearer {token}", "apikey {token}", or custom like "x-api-key: {token}"
+        request_headers_to_medium["Authorization"] = f"Bearer {MEDIUM_API_KEY}"
+        # Example for a different header:
+        # request_headers_to_medium["X-YOUR-API-KEY-HEADER"] = MEDIUM_API_KEY
+    CLIENT = httpx.AsyncClient(
+        headers=request_headers_to_medium,
+        timeout=25, # Slightly longer timeout, adjust as needed
+        transport=httpx.AsyncHTTPTransport(http2=True, limits=limits, retries=3)
+    )
+    app.add_background_task(warm_medium_connection)
+
+async def warm_medium_connection():
+    """Opens the pooled connection to Medium (DNS lookup + TCP + TLS handshake) right after startup,
+    so the first client request doesn't pay for it. The response status doesn't matter."""
+    try:
+        await CLIENT.head(MEDIUM_GRAPHQL_ENDPOINT)
+    except httpx.HTTPError as e:
+        app.logger.warning("Could not pre-open the connection to Medium: %s", e)
+
+@app.after_serving
+async def close_medium_client():
+    await CLIENT.aclose()
+
+# --- Medium API ---
+class MediumGraphQLError(Exception):
+    """Raised when Medium answers the HTTP request but reports GraphQL errors in the body."""
+    def __init__(self, errors):
+        super().__init__("GraphQL error(s) received from Medium.")
+        self.errors = errors
+
+async def fetch_tag_feed(client, tag_slug, mode):
+    """Fetches one TagFeed from Medium and returns its processed articles (list of dicts).
+    Raises httpx errors, json.JSONDecodeError or MediumGraphQLError; see upstream_error()."""
+    payload = {"query": GRAPHQL_QUERY, "variables": {"tagSlug": tag_slug, "mode": mode}}
+
+    if app.logger.isEnabledFor(logging.DEBUG): # Avoid serializing the payload when debug logs are off
+        app.logger.debug("Sending GraphQL request to Medium. Payload: %s", json.dumps(payload, indent=2))
+
+    response_from_medium = await client.post(
+        MEDIUM_GRAPHQL_ENDPOINT,
+        content=orjson.dumps(payload) # Content-Type and Authorization are already set on the client
+    )
+    # This will raise an HTTPError if the HTTP request returned an unsuccessful status code (4xx or 5xx)
+    response_from_medium.raise_for_status()
+
+    try:
+        cleaned_body = clean_medium_response(response_from_medium.content)
+        data_from_medium = orjson.loads(cleaned_body)
+    except json.JSONDecodeError as e:
+        # Medium's response (after cleaning) isn't valid JSON.
+        # It's good to log the problematic text if possible (be careful with large responses)
+        app.logger.error("Failed to decode JSON response from Medium: %s. Response text sample: %s", e, response_from_medium.text[:500])
+        raise
+
+    # Check for GraphQL-specific errors returned in the JSON body (even with a 200 OK HTTP status)
+    if "errors" in data_from_medium and data_from_medium["errors"]:
+        app.logger.warning("GraphQL errors received from Medium: %s", json.dumps(data_from_medium['errors'], indent=2))
+        raise MediumGraphQLError(data_from_medium["errors"])
+
+    # Process and format the successful response; items without a "post" object or a link are skipped
+    items = data_from_medium.get("data", {}).get("tagFeed", {}).get("items", [])
+    app.logger.info("Received %d items from Medium for tag '%s'.", len(items), tag_slug)
+
+    posts = [item["post"] for item in items if item.get("post")]
+    processed_articles = [article for article in map(make_article, posts) if article is not None]
+    if len(processed_articles) < len(items):
+        app.logger.debug("%d items skipped: no 'post' object or no usable link.", len(items) - len(processed_articles))
+
+    app.logger.info("Successfully processed %d articles.", len(processed_articles))
+    return processed_articles
+
+async def fetch_and_cache_tag_feed(cache_key):
+    processed_articles = await fetch_tag_feed(CLIENT, *cache_key)
+    FEED_CACHE[cache_key] = processed_articles
+    return processed_articles
+
+def finish_inflight_fetch(cache_key, fetch):
+    """Done callback for a shared fetch: drops it from INFLIGHT_FETCHES and reads its exception,
+    so a failure whose waiters all disconnected isn't reported as "Task exception was never retrieved"."""
+    if INFLIGHT_FETCHES.get(cache_key) is fetch:
+        del INFLIGHT_FETCHES[cache_key]
+    if not fetch.cancelled():
+        fetch.exception()
+
+async def get_tag_feed(tag_slug, mode):
+    """Returns the processed articles for (tag_slug, mode), from FEED_CACHE when fresh.
+    Concurrent cache misses for the same key share one upstream fetch (see INFLIGHT_FETCHES)."""
+    cache_key = (tag_slug, mode)
+    cached_articles = FEED_CACHE.get(cache_key)
+    if cached_articles is not None:
+        app.logger.info("Serving %d cached articles for tag '%s' (%s).", len(cached_articles), tag_slug, mode)
+        return cached_articles
+
+    fetch = INFLIGHT_FETCHES.get(cache_key)
+    if fetch is None:
+        fetch = asyncio.create_task(fetch_and_cache_tag_feed(cache_key))
+        INFLIGHT_FETCHES[cache_key] = fetch
+        fetch.add_done_callback(functools.partial(finish_inflight_fetch, cache_key))
+    else:
+        app.logger.info("Joining in-flight fetch for tag '%s' (%s).", tag_slug, mode)
+    # Shielded so one client disconnecting doesn't cancel the fetch the others are waiting on
+    return await asyncio.shield(fetch)
+
+# Formatting a traceback is expensive, and during an outage the same one repeats on every request,
+# so full tracebacks are logged at most once per interval per exception type.
+TRACEBACK_INTERVAL_SECONDS = 5
+LAST_TRACEBACK_AT = {}
+
+def should_log_traceback(e):
+    now = time.monotonic()
+    if now - LAST_TRACEBACK_AT.get(type(e), float("-inf")) > TRACEBACK_INTERVAL_SECONDS:
+        LAST_TRACEBACK_AT[type(e)] = now
+        return True
+    return False
+
+# Upstream failures that map to a fixed response, checked in order (TimeoutException is a RequestError).
+# (exception type, HTTP status, log message or None if already logged, error, details or None for str(e))
+UPSTREAM_ERRORS = (
+    (httpx.TimeoutException, 504, "Timeout while trying to contact Medium API: %s", # Gateway Timeout
+     "Request to Medium API timed out.", "The upstream server took too long to respond."),
+    (httpx.RequestError, 503, "RequestException (Network issue) while contacting Medium: %s", # DNS failure, connection refused, etc.
+     "Network error connecting to Medium API. Check internet connection.", None),
+    (json.JSONDecodeError, 502, None, # Bad Gateway; logged with a response sample in fetch_tag_feed()
+     "Invalid or unexpected response format from Medium.", None),
+)
+
+def upstream_error(e):
+    """Logs an exception raised while getting a tag feed and maps it to (error body, HTTP status)."""
+    if isinstance(e, MediumGraphQLError):
+        # You might want to return these specific errors to the client
+        return {"error": str(e), "details": e.errors}, 400 # Or 502 if it's a server-side issue with Medium
+    if isinstance(e, httpx.HTTPStatusError):
+        # This catches errors from response_from_medium.raise_for_status() (4xx/5xx from Medium)
+        try:
+            medium_error_details = e.response.json()
+            app.logger.error("HTTPError contacting Medium: Status %d - Details: %s", e.response.status_code, json.dumps(medium_error_details, indent=2))
+        except json.JSONDecodeError:
+            # Show start of non-JSON error response
+            app.logger.error("HTTPError contacting Medium: Status %d - Response: %s", e.response.status_code, e.response.text[:500])
+        return {"error": "Failed to communicate effectively with Medium API.", "details": str(e)}, e.response.status_code
+
+    for exc_type, status, log_message, error, details in UPSTREAM_ERRORS:
+        if isinstance(e, exc_type):
+            if log_message:
+                app.logger.error(log_message, e)
+            return {"error": error, "details": details or str(e)}, status
+
+    # Catch-all for any other unexpected errors
+    # exc_info will log the full traceback, at most once per TRACEBACK_INTERVAL_SECONDS per exception type
+    app.logger.critical("An critical unexpected error occurred while getting a tag feed: %s - %s", type(e).__name__, e,
+                        exc_info=e if should_log_traceback(e) else None)
+    return {"error": "An unexpected internal server error occurred.", "details": "Please check server logs."}, 500
+
+def validate_feed_request(data):
+    """Validates one {"tagSlug", "mode"} object from a client.
+    Returns (tag_slug, mode, None) with mode normalized, or (None, None, error_message)."""
+    tag_slug, mode = data.get('tagSlug'), data.get('mode')
 
     if not tag_slug:
         app.logger.info("Request missing 'tagSlug'.")
-        return jsonify({"error": "Missing 'tagSlug' in request body."}), 400
+        return None, None, "Missing 'tagSlug' in request body."
     if not mode:
         app.logger.info("Request missing 'mode'.")
-        return jsonify({"error": "Missing 'mode' in request body."}), 400
-
-    mode = str(mode).strip().upper() # Ensure mode is a string before upper()
-    valid_modes = ["HOT", "NEW", "TOP_ALL_TIME", "TOP_MONTH", "TOP_WEEK", "TOP_YEAR"]
-    if mode not in valid_modes:
-        app.logger.info(f"Invalid mode '{mode}' provided.")
-        return jsonify({"error": f"Invalid mode. Must be one of: {', '.join(valid_modes)}"}), 400
-
-    app.logger.info(f"Processing TagFeed request: tagSlug='{tag_slug}', mode='{mode}'")
-
-    graphql_query = """
-    query TagFeed($tagSlug: String!, $mode: TagFeedMode!) {
-      tagFeed(tagSlug: $tagSlug, mode: $mode) {
-        items {
-          feedId
-          post {
-            id # Post ID, often useful
-            title
-            mediumUrl # Canonical URL if available
-            uniqueSlug # Used for constructing URLs
-            creator {
-              id # User ID
-              name
-              username # Often part of the URL structure
-            }
-          }
-        }
-      }
-    }
-    """
+        return None, None, "Missing 'mode' in request body."
 
-    variables = {
-        "tagSlug": tag_slug,
-        "mode": mode
-    }
+    if not isinstance(tag_slug, str) or not isinstance(mode, str):
+        app.logger.info("Request with non-string 'tagSlug'/'mode'.")
+        return None, None, "'tagSlug' and 'mode' must be strings."
 
-    payload = {
-        "query": graphql_query,
-        "variables": variables
-    }
+    if mode not in VALID_MODES: # Already-normalized modes skip the strip()/upper() copies
+        mode = mode.strip().upper()
+        if mode not in VALID_MODES:
+            app.logger.info("Invalid mode '%s' provided.", mode)
+            return None, None, VALID_MODES_MSG
 
-    # Prepare request headers for Medium API call
-    request_headers_to_medium = {**BASE_REQUEST_HEADERS} # Make a copy
-    # Ensure this matches Medium's expected auth scheme for its GraphQL API key
-    # Common schemes: "Bearer {token}", "apikey {token}", or custom like "x-api-key: {token}"
-    request_headers_to_medium["Authorization"] = f"Bearer {MEDIUM_API_KEY}"
-    # Example for a different header:
-    # request_headers_to_medium["X-YOUR-API-KEY-HEADER"] = MEDIUM_API_KEY
+    return tag_slug, mode, None
 
-    app.logger.debug(f"Sending GraphQL request to Medium. Payload: {json.dumps(payload, indent=2)}")
+# --- Routes ---
+@app.route('/') # Root route to check if the app is alive
+async def home():
+    app.logger.info("Home route accessed.")
+    return json_response({"status": "Medium TagFeed Proxy is running correctly!", "message": "Welcome!"}, 200)
+
+@app.route('/get-tag-feed', methods=['POST'])
+async def get_tag_feed_handler():
+    app.logger.info("Received request for /get-tag-feed from IP: %s", request.remote_addr)
+
+    if not MEDIUM_API_KEY:
+        app.logger.error("CRITICAL: MEDIUM_API_KEY environment variable not configured on the server.")
+        return json_response({"error": "Server configuration error: API key missing."}, 500)
+
+    # silent=True returns None for a missing/invalid body or wrong Content-Type instead of raising
+    client_data = await request.get_json(silent=True, cache=False)
+    if not isinstance(client_data, dict):
+        app.logger.warning("Received empty/invalid JSON data in request body.")
+        return json_response({"error": "No JSON data provided in request body or invalid JSON format."}, 400)
+
+    tag_slug, mode, error_message = validate_feed_request(client_data)
+    if error_message:
+        return json_response({"error": error_message}, 400)
+
+    app.logger.info("Processing TagFeed request: tagSlug='%s', mode='%s'", tag_slug, mode)
 
     try:
-        response_from_medium = requests.post(
-            MEDIUM_GRAPHQL_ENDPOINT,
-            headers=request_headers_to_medium,
-            json=payload,
-            timeout=25 # Slightly longer timeout, adjust as needed
-        )
-        # This will raise an HTTPError if the HTTP request returned an unsuccessful status code (4xx or 5xx)
-        response_from_medium.raise_for_status()
-
-        cleaned_text = clean_medium_response(response_from_medium.text)
-        data_from_medium = json.loads(cleaned_text)
-
-        # Check for GraphQL-specific errors returned in the JSON body (even with a 200 OK HTTP status)
-        if "errors" in data_from_medium and data_from_medium["errors"]:
-            app.logger.warning(f"GraphQL errors received from Medium: {json.dumps(data_from_medium['errors'], indent=2)}")
-            # You might want to return these specific errors to the client
-            return jsonify({"error": "GraphQL error(s) received from Medium.", "details": data_from_medium["errors"]}), 400 # Or 502 if it's a server-side issue with Medium
-
-        # Process and format the successful response
-        processed_articles = []
-        items = data_from_medium.get("data", {}).get("tagFeed", {}).get("items", [])
-        app.logger.info(f"Received {len(items)} items from Medium for tag '{tag_slug}'.")
-
-        for item_index, item in enumerate(items):
-            post_data = item.get("post")
-            if not post_data:
-                app.logger.debug(f"Item {item_index} skipped: no 'post' object.")
-                continue
-
-            feed_id = item.get("feedId") # May or may not be the same as post.id
-            title = post_data.get("title", "Untitled")
-            author_name = post_data.get("creator", {}).get("name", "Unknown Author")
-            
-            article_link = post_data.get("mediumUrl") # Prefer this if available
-
-            if not article_link: # Fallback link construction
-                unique_slug = post_data.get("uniqueSlug")
-                author_username = post_data.get("creator", {}).get("username")
-                if unique_slug:
-                    if author_username:
-                        article_link = f"https://{author_username}.medium.com/{unique_slug}"
-                    else:
-                        # Fallback if author username isn't available for the URL pattern
-                        # This pattern might need adjustment based on how Medium constructs URLs for posts without a custom subdomain
-                        article_link = f"https://medium.com/p/{post_data.get('id', unique_slug)}" # Use post.id if available, else uniqueSlug
-                elif feed_id: # Absolute last resort, may not be a direct link
-                    article_link = f"https://medium.com/p/{feed_id}" # This format can be unreliable; test it
-            
-            if not article_link:
-                article_link = f"Link construction failed (feedId: {feed_id}, postId: {post_data.get('id')})"
-
-
-            processed_articles.append({
-                "title": title,
-                "author": author_name,
-                "link": article_link
-            })
-
-        app.logger.info(f"Successfully processed {len(processed_articles)} articles.")
-        return jsonify({"articles": processed_articles}), 200
-
-    except requests.exceptions.HTTPError as e:
-        # This catches errors from response_from_medium.raise_for_status() (4xx/5xx from Medium)
-        error_message = f"HTTPError contacting Medium: Status {e.response.status_code}"
-        try:
-            medium_error_details = e.response.json()
-            error_message += f" - Details: {json.dumps(medium_error_details, indent=2)}"
-        except json.JSONDecodeError:
-            error_message += f" - Response: {e.response.text[:500]}" # Show start of non-JSON error response
-        app.logger.error(error_message)
-        return jsonify({"error": "Failed to communicate effectively with Medium API.", "details": str(e)}), e.response.status_code if e.response is not None else 503
-    except requests.exceptions.Timeout:
-        app.logger.error(f"Timeout while trying to contact Medium API at {MEDIUM_GRAPHQL_ENDPOINT}")
-        return jsonify({"error": "Request to Medium API timed out.", "details": "The upstream server took too long to respond."}), 504 # Gateway Timeout
-    except requests.exceptions.RequestException as e:
-        # This catches other network issues like DNS failure, connection refused, etc.
-        app.logger.error(f"RequestException (Network issue) while contacting Medium: {str(e)}")
-        return jsonify({"error": "Network error connecting to Medium API. Check internet connection.", "details": str(e)}), 503 # Service Unavailable
-    except json.JSONDecodeError as e:
-        # This catches errors if Medium's response (after cleaning) isn't valid JSON
-        # It's good to log the problematic text if possible (be careful with large responses)
-        raw_text = response_from_medium.text if 'response_from_medium' in locals() else "Response text unavailable"
-        app.logger.error(f"Failed to decode JSON response from Medium: {str(e)}. Response text sample: {raw_text[:500]}")
-        return jsonify({"error": "Invalid or unexpected response format from Medium.", "details": str(e)}), 502 # Bad Gateway
+        processed_articles = await get_tag_feed(tag_slug, mode)
     except Exception as e:
-        # Catch-all for any other unexpected errors in this route
-        app.logger.critical(f"An critical unexpected error occurred in get_tag_feed_handler: {type(e).__name__} - {str(e)}", exc_info=True)
-        # exc_info=True in logger.critical will log the full traceback
-        return jsonify({"error": "An unexpected internal server error occurred.", "details": "Please check server logs."}), 500
+        error_body, status = upstream_error(e)
+        return json_response(error_body, status)
+    return feed_response(processed_articles)
+
+@app.route('/get-tag-feeds', methods=['POST'])
+async def get_tag_feeds_handler():
+    """Batch variant of /get-tag-feed for clients rendering several tags at once.
+    Body: {"requests": [{"tagSlug": ..., "mode": ...}, ...]}
+    All feeds are fetched concurrently; the response keeps the request order:
+    {"feeds": [{"tagSlug", "mode", "articles"} or {"tagSlug", "mode", "status", "error", "details"}, ...]}"""
+    app.logger.info("Received request for /get-tag-feeds from IP: %s", request.remote_addr)
+
+    if not MEDIUM_API_KEY:
+        app.logger.error("CRITICAL: MEDIUM_API_KEY environment variable not configured on the server.")
+        return json_response({"error": "Server configuration error: API key missing."}, 500)
+
+    client_data = await request.get_json(silent=True, cache=False)
+    if not isinstance(client_data, dict):
+        app.logger.warning("Received empty/invalid JSON data in request body.")
+        return json_response({"error": "No JSON data provided in request body or invalid JSON format."}, 400)
+
+    feed_requests = client_data.get('requests')
+    if not isinstance(feed_requests, list) or not feed_requests:
+        app.logger.info("Request missing a non-empty 'requests' list.")
+        return json_response({"error": "Missing 'requests' list in request body."}, 400)
+    if len(feed_requests) > MAX_BATCH_FEEDS:
+        return json_response({"error": f"Too many feeds requested. At most {MAX_BATCH_FEEDS} per call."}, 400)
+
+    feeds_to_get = []
+    for index, feed_request in enumerate(feed_requests):
+        if not isinstance(feed_request, dict):
+            return json_response({"error": f"requests[{index}]: each entry must be an object."}, 400)
+        tag_slug, mode, error_message = validate_feed_request(feed_request)
+        if error_message:
+            return json_response({"error": f"requests[{index}]: {error_message}"}, 400)
+        feeds_to_get.append((tag_slug, mode))
+
+    app.logger.info("Processing %d TagFeed requests concurrently.", len(feeds_to_get))
+
+    results = await asyncio.gather(
+        *(get_tag_feed(tag_slug, mode) for tag_slug, mode in feeds_to_get),
+        return_exceptions=True
+    )
+
+    feeds = []
+    for (tag_slug, mode), result in zip(feeds_to_get, results):
+        if isinstance(result, asyncio.CancelledError):
+            # The shared fetch was cancelled (e.g. during shutdown); a BaseException, not an upstream error
+            app.logger.warning("Fetch for tag '%s' (%s) was cancelled.", tag_slug, mode)
+            feeds.append({"tagSlug": tag_slug, "mode": mode, "status": 503,
+                          "error": "Request to Medium API was cancelled.", "details": "Please retry."})
+        elif isinstance(result, BaseException):
+            error_body, status = upstream_error(result)
+            feeds.append({"tagSlug": tag_slug, "mode": mode, "status": status, **error_body})
+        else:
+            feeds.append({"tagSlug": tag_slug, "mode": mode, "articles": result})
+    return json_response({"feeds": feeds}, 200)
 
 # --- Main Execution Block ---
 if __name__ == '__main__':
-    # For local development (iSH or your computer). Render will use Gunicorn.
+    # For local development (iSH or your computer). Render will use Hypercorn (see Procfile.txt):
+    # it serves HTTP/1.1 and HTTP/2 (h2 over TLS, h2c in cleartext) with keep-alive, on uvloop workers.
     # Using host='0.0.0.0' makes the server accessible from other devices on your local network (e.g., your computer accessing iSH).
     # Debug mode is useful for development as it provides detailed error pages and auto-reloads on code changes.
     # Do not run with debug=True in a production environment deployed to the public. Render will handle this.
@@ -229,5 +506,5 @@ if __name__ == '__main__':
     # Render sets its own PORT environment variable.
     port = int(os.environ.get("PORT", 8080))
     
-    app.logger.info(f"Starting Flask development server on host 0.0.0.0, port {port}, debug=True")
+    app.logger.info("Starting Quart development server on host 0.0.0.0, port %d, debug=False", port)
     app.run(host='0.0.0.0', port=port, debug=False)